@@ -1,39 +1,146 @@
 # app.py — The main entry point for the GREENBYTE Flask backend
 # This file creates the Flask app and registers all the routes
 
-from flask import Flask
+from flask import Flask, request
+from flask.json.provider import JSONProvider
+from flask.sessions import SecureCookieSessionInterface
 from flask_cors import CORS          # Allows your frontend to talk to this backend
 from dotenv import load_dotenv       # Loads secrets from .env file
+import orjson                        # Much faster JSON encoder written in Rust
 import os
 
 # Load environment variables from .env file BEFORE anything else
 load_dotenv()
 
 # Import the route blueprints (each file handles a group of endpoints)
+from extensions import cache
 from auth_routes import auth_bp
 from email_routes import email_bp
 
-# --- Create the Flask app ---
-app = Flask(__name__)
+# --- Faster JSON responses ---
+# Flask uses the stdlib json module by default; orjson serializes the nested
+# summary payload 3-10x faster. Plugging it in as the app's JSON provider
+# means every jsonify() call uses it automatically — no route changes needed.
+class ORJSONProvider(JSONProvider):
+    def dumps(self, obj, **kwargs):
+        # OPT_SERIALIZE_NUMPY lets NumPy ints/arrays from the analyzer pass
+        # straight through without converting them to Python types first
+        return orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY).decode()
 
-# SECRET_KEY is used by Flask to sign session cookies (keeps login state)
-# NEVER hardcode this — always pull from .env
-app.secret_key = os.getenv("FLASK_SECRET_KEY", "fallback-secret-for-dev-only")
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
 
-# --- Enable CORS ---
-# Explicit origins required when supports_credentials=True —
-# browsers REJECT wildcard "*" for credentialed cross-origin requests.
-# Add any other origin you use (e.g. a Vite dev server on port 5173).
-CORS(app, supports_credentials=True, origins=[
-    "https://tink-her-hack-temp-w295.onrender.com",
+
+# --- Skip session work where it isn't needed ---
+# Flask opens (decodes + verifies) the signed session cookie on EVERY request.
+# CORS preflights, static assets and health checks never touch the session,
+# so hand them a null session and skip the cookie crypto entirely.
+class FilteredSessionInterface(SecureCookieSessionInterface):
+    def open_session(self, app, request):
+        if request.method == "OPTIONS" or request.path.startswith(("/static/", "/health")):
+            return self.null_session_class()
+        return super().open_session(app, request)
+
+
+# The default CORS origins if the CORS_ORIGINS env var isn't set —
+# the deployed frontend plus GitHub Pages
+DEFAULT_CORS_ORIGINS = (
+    "https://tink-her-hack-temp-w295.onrender.com,"
     "https://seethalekshmy.github.io"
-])
+)
+
+
+def create_app():
+    """
+    Application factory: builds and configures the Flask app.
+
+    Everything environment-specific (secret key, CORS origins) comes from
+    env vars, so local dev and production run the SAME code — no separate
+    app.py copies that drift apart. Set CORS_ORIGINS to a comma-separated
+    list to allow different frontends per deployment.
+    """
+    app = Flask(__name__)
+    app.json = ORJSONProvider(app)
+    app.session_interface = FilteredSessionInterface()
+
+    # --- Set up caching ---
+    # Gmail contents change slowly compared to how often people reload the dashboard,
+    # so we cache the analysis for 15 minutes (900 s). Repeat page loads become
+    # instant cache hits instead of re-fetching 500 messages from Google.
+    cache.init_app(app, config={
+        "CACHE_TYPE": "SimpleCache",         # In-memory — use RedisCache in production
+        "CACHE_DEFAULT_TIMEOUT": 900         # 15 minutes
+    })
+
+    # SECRET_KEY is used by Flask to sign session cookies (keeps login state)
+    # NEVER hardcode this — always pull from .env
+    app.secret_key = os.getenv("FLASK_SECRET_KEY", "fallback-secret-for-dev-only")
+
+    # --- Enable CORS ---
+    # Explicit origins required when supports_credentials=True —
+    # browsers REJECT wildcard "*" for credentialed cross-origin requests.
+    # Add any other origin you use (e.g. a Vite dev server on port 5173)
+    # via the CORS_ORIGINS env var.
+    origins = [
+        origin.strip()
+        for origin in os.getenv("CORS_ORIGINS", DEFAULT_CORS_ORIGINS).split(",")
+        if origin.strip()
+    ]
+    CORS(app, supports_credentials=True, origins=origins)
+
+    # frozenset gives O(1) membership checks in the preflight fast path below
+    # (flask-cors scans its origin list per request)
+    allowed_origins = frozenset(origins)
+
+    @app.before_request
+    def fast_preflight():
+        # Short-circuit CORS preflights: browsers fire an OPTIONS request
+        # before every credentialed cross-origin call, and those only need a
+        # handful of static headers back. Answering here skips URL routing,
+        # the view, and the rest of the request machinery.
+        if request.method != "OPTIONS":
+            return None
+
+        response = app.make_response("")
+        response.status_code = 204
+        origin = request.headers.get("Origin")
+        if origin in allowed_origins:
+            response.headers["Access-Control-Allow-Origin"] = origin
+            response.headers["Access-Control-Allow-Credentials"] = "true"
+            response.headers["Access-Control-Allow-Headers"] = request.headers.get(
+                "Access-Control-Request-Headers", "Content-Type"
+            )
+            response.headers["Access-Control-Allow-Methods"] = "GET, POST, OPTIONS"
+            response.headers["Access-Control-Max-Age"] = "600"
+        return response
+
+    # --- Register Blueprints (route groups) ---
+    app.register_blueprint(auth_bp)     # Handles /auth and /callback
+    app.register_blueprint(email_bp)    # Handles /emails/summary
+
+    @app.route("/health")
+    def health():
+        """Cheap liveness check for the hosting platform — no session, no Gmail."""
+        return {"status": "ok"}
+
+    @app.after_request
+    def add_vary_cookie(response):
+        # Responses differ per logged-in user, so tell caching proxies to key on
+        # the Cookie header — otherwise one user's cached response could be
+        # served to another
+        response.vary.add("Cookie")
+        return response
+
+    return app
+
 
-# --- Register Blueprints (route groups) ---
-app.register_blueprint(auth_bp)     # Handles /auth and /callback
-app.register_blueprint(email_bp)    # Handles /emails/summary
+# Module-level app so "gunicorn wsgi:app" / "from app import app" keep working
+app = create_app()
 
-# --- Run the server ---
+# --- Run the server (development only) ---
+# Werkzeug's dev server handles ONE request at a time — fine locally, but a
+# single slow Gmail fetch would block everyone else. In production, run
+# through wsgi.py under gunicorn's gevent workers instead (see Procfile).
 if __name__ == "__main__":
     # debug=True auto-reloads when you save files — great for development!
     # Set debug=False in production
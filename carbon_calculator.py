@@ -8,6 +8,9 @@
 # Sources: The Shift Project, IEA, Mike Berners-Lee "How Bad Are Bananas?"
 # Note: These are simplified estimates — real figures vary by data center location & energy mix.
 
+from bisect import bisect_right
+from functools import lru_cache
+
 # Energy used per MB of data stored per day (kWh)
 KWH_PER_MB_PER_DAY = 0.00000007
 
@@ -24,31 +27,58 @@ KG_CO2_PER_CAR_MILE = 0.21
 # A tree absorbs roughly 21 kg of CO2 per year
 KG_CO2_ABSORBED_PER_TREE_PER_YEAR = 21
 
+# --- Precomputed constants (hot path) ---
+# The three formula factors never change, so fold them into one multiplier
+# once at import time instead of redoing the arithmetic on every request.
+# Same idea for the divisions: multiply by a precomputed reciprocal.
+_CO2_PER_MB_YEAR = DAYS_PER_YEAR * KWH_PER_MB_PER_DAY * KG_CO2_PER_KWH
+_INV_CAR = 1.0 / KG_CO2_PER_CAR_MILE
+_INV_TREE = 1.0 / KG_CO2_ABSORBED_PER_TREE_PER_YEAR
 
-def calculate_carbon(total_size_mb: float) -> dict:
+# Severity levels as a lookup table: bisect finds which bucket the CO2 value
+# falls in, replacing the old if/elif chain with one binary search.
+_SEVERITY_CUTOFFS_KG = (0.01, 0.1, 1.0)
+_SEVERITY_LEVELS = (
+    ("🟢 Very Low", "Great job! Your email footprint is minimal."),
+    ("🟡 Low", "Not bad! Deleting old emails could reduce this further."),
+    ("🟠 Moderate", "Consider unsubscribing from newsletters and deleting emails older than 1 year."),
+    ("🔴 High", "Your email storage has a significant footprint. A regular email cleanup could help a lot!"),
+)
+
+# The constant tail of the formula note never changes either — only the MB
+# value at the front does, so the rest is built once here.
+_FORMULA_TAIL = (
+    f"MB × {DAYS_PER_YEAR} days × "
+    f"{KWH_PER_MB_PER_DAY} kWh/MB/day × {KG_CO2_PER_KWH} kg CO2/kWh"
+)
+
+
+@lru_cache(maxsize=4096)
+def _core_calc(size_key: int) -> tuple:
     """
-    Estimates the annual carbon footprint of storing email data.
-    
-    Args:
-        total_size_mb: Total size of analyzed emails in megabytes
-    
-    Returns:
-        A dictionary with carbon estimates and relatable comparisons
+    The numeric heart of the carbon estimate, memoized.
+
+    size_key is the mailbox size in HUNDREDTHS of a MB (0.01 MB resolution) —
+    an int so it's hashable and so users with near-identical mailbox sizes
+    share one cache entry. Returns the numbers as a tuple; calculate_carbon
+    assembles the user-facing dict around them.
     """
+    total_size_mb = size_key * 0.01
 
     # --- Core calculation ---
     # Annual CO2 from storing this email data for one year
-    annual_co2_kg = total_size_mb * DAYS_PER_YEAR * KWH_PER_MB_PER_DAY * KG_CO2_PER_KWH
+    # (one multiply — the per-MB-per-year factor was folded at import time)
+    annual_co2_kg = total_size_mb * _CO2_PER_MB_YEAR
 
     # Convert to grams for smaller values (easier to read if < 1 kg)
     annual_co2_grams = annual_co2_kg * 1000
 
     # --- Relatable comparisons ---
     # How many car miles does this equal?
-    equivalent_car_miles = annual_co2_kg / KG_CO2_PER_CAR_MILE
+    equivalent_car_miles = annual_co2_kg * _INV_CAR
 
     # How many trees would need to absorb this?
-    trees_needed = annual_co2_kg / KG_CO2_ABSORBED_PER_TREE_PER_YEAR
+    trees_needed = annual_co2_kg * _INV_TREE
 
     # --- Savings potential ---
     # If the user deleted their old emails (assume 30% are deletable), how much CO2 saved?
@@ -56,19 +86,44 @@ def calculate_carbon(total_size_mb: float) -> dict:
     potential_savings_kg = annual_co2_kg * deletable_fraction
 
     # --- Severity label ---
-    # Give users a simple label to understand their footprint level
-    if annual_co2_kg < 0.01:
-        severity = "🟢 Very Low"
-        tip = "Great job! Your email footprint is minimal."
-    elif annual_co2_kg < 0.1:
-        severity = "🟡 Low"
-        tip = "Not bad! Deleting old emails could reduce this further."
-    elif annual_co2_kg < 1.0:
-        severity = "🟠 Moderate"
-        tip = "Consider unsubscribing from newsletters and deleting emails older than 1 year."
-    else:
-        severity = "🔴 High"
-        tip = "Your email storage has a significant footprint. A regular email cleanup could help a lot!"
+    # Give users a simple label to understand their footprint level.
+    # bisect finds which bucket the value lands in — one lookup instead
+    # of walking an if/elif chain.
+    severity_index = bisect_right(_SEVERITY_CUTOFFS_KG, annual_co2_kg)
+
+    return (
+        annual_co2_kg,
+        annual_co2_grams,
+        equivalent_car_miles,
+        trees_needed,
+        potential_savings_kg,
+        severity_index
+    )
+
+
+def calculate_carbon(total_size_mb: float) -> dict:
+    """
+    Estimates the annual carbon footprint of storing email data.
+
+    Args:
+        total_size_mb: Total size of analyzed emails in megabytes
+
+    Returns:
+        A dictionary with carbon estimates and relatable comparisons
+    """
+
+    # Quantize to 0.01 MB so repeat calls (and similarly-sized mailboxes)
+    # hit the lru_cache instead of redoing the arithmetic
+    (
+        annual_co2_kg,
+        annual_co2_grams,
+        equivalent_car_miles,
+        trees_needed,
+        potential_savings_kg,
+        severity_index
+    ) = _core_calc(int(round(total_size_mb * 100)))
+
+    severity, tip = _SEVERITY_LEVELS[severity_index]
 
     return {
         "total_storage_analyzed_mb": round(total_size_mb, 2),
@@ -84,8 +139,5 @@ def calculate_carbon(total_size_mb: float) -> dict:
             "if_deleted_30_percent_kg": round(potential_savings_kg, 6),
             "description": "Estimated CO2 saved if you deleted 30% of your emails"
         },
-        "formula_note": (
-            f"Formula: {total_size_mb:.2f} MB × {DAYS_PER_YEAR} days × "
-            f"{KWH_PER_MB_PER_DAY} kWh/MB/day × {KG_CO2_PER_KWH} kg CO2/kWh"
-        )
+        "formula_note": f"Formula: {total_size_mb:.2f} {_FORMULA_TAIL}"
     }
@@ -1,24 +1,106 @@
 # routes/email_routes.py — Handles the /emails/summary endpoint
 # This is the main endpoint that returns email analysis + carbon footprint data
 
-from flask import Blueprint, jsonify
+import hashlib
+
+import orjson
+from flask import Blueprint, Response, jsonify, request, stream_with_context
+from extensions import cache
 from gmail_service import get_gmail_service
-from email_analyzer import analyze_emails
+from email_analyzer import analyze_emails, analyze_emails_stream
 from carbon_calculator import calculate_carbon
 
 email_bp = Blueprint("email", __name__)
 
 
+def _user_cache_key(service):
+    """
+    Builds a stable cache key for the current user.
+
+    We hash the access token instead of using it directly so the raw token
+    never ends up inside cache keys (which could get logged).
+    """
+    token = service._http.credentials.token or ""
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+class SummaryError(Exception):
+    """
+    Raised inside _cached_summary when the analysis fails.
+
+    Raising (instead of returning an error tuple) matters here: Flask-Caching
+    does NOT store a result when the memoized function raises, so a transient
+    Gmail hiccup is never pinned in the cache — the next request retries
+    instead of replaying the failure for 15 minutes.
+    """
+    def __init__(self, message, status_code):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+
+
+@cache.memoize(timeout=900)
+def _cached_summary(user_key):
+    """
+    Runs the full Gmail analysis + carbon calculation for one user.
+
+    The result is memoized per user_key for 15 minutes, so only the FIRST
+    dashboard load pays the cost of the batch fetch — repeat loads are
+    served straight from memory. Only SUCCESSFUL payloads are cached;
+    failures raise SummaryError and bypass the cache entirely.
+    """
+    # Re-acquire the service inside the memoized function — on a cache hit
+    # this function never runs at all, so the work is only done when needed
+    service, error = get_gmail_service()
+    if error:
+        raise SummaryError(error, 401)
+
+    # Fetch and analyze email metadata from Gmail
+    # We only read metadata (size, date, labels) — NOT the email content/body
+    analysis, error = analyze_emails(service)
+    if error:
+        raise SummaryError(error, 500)
+
+    # Calculate carbon footprint from the estimated WHOLE-mailbox storage
+    # (extrapolated from the sample), not just the sampled slice
+    carbon_data = calculate_carbon(
+        analysis.get("estimated_total_size_mb", analysis["total_size_mb"])
+    )
+
+    # Record the mailbox's historyId alongside the payload — it is the ETag
+    # for THIS analysis, so tag and body always describe the same data
+    # (best-effort: None just means no ETag on the response)
+    history_id = None
+    try:
+        profile = service.users().getProfile(
+            userId="me", fields="historyId"
+        ).execute()
+        history_id = str(profile["historyId"])
+    except Exception as e:
+        print(f"⚠️ historyId fetch skipped: {e}")
+
+    return {
+        "status": "success",
+        "email_stats": analysis,
+        "carbon_footprint": carbon_data,
+        "message": "💚 GREENBYTE analysis complete",
+        "history_id": history_id
+    }
+
+
 @email_bp.route("/emails/summary")
 def email_summary():
     """
     GET /emails/summary
-    
+
     Returns a JSON object with:
     - Email statistics (count, size, old emails, large attachments)
     - Carbon footprint estimate
-    
+
     Requires the user to have completed /auth first.
+    Results are cached per user for 15 minutes — see /emails/refresh to force
+    a fresh analysis. Also supports ETag revalidation: send back the ETag we
+    gave you in If-None-Match and you'll get a free 304 if nothing changed.
     """
     # Get an authenticated Gmail API client
     # If not authenticated, this will return an error
@@ -29,19 +111,116 @@ def email_summary():
             "hint": "Visit /auth first to connect your Gmail account"
         }), 401
 
-    # Fetch and analyze email metadata from Gmail
-    # We only read metadata (size, date, labels) — NOT the email content/body
-    analysis, error = analyze_emails(service)
+    # --- Freshness check ---
+    # Gmail's historyId only moves when the mailbox changes. One tiny profile
+    # call tells us whether the memoized analysis is still describing the
+    # current mailbox. (Best-effort: if the call hiccups we just serve the
+    # cached payload without revalidation.)
+    live_history_id = None
+    try:
+        profile = service.users().getProfile(
+            userId="me", fields="historyId"
+        ).execute()
+        live_history_id = str(profile["historyId"])
+    except Exception as e:
+        print(f"⚠️ ETag check skipped: {e}")
+
+    user_key = _user_cache_key(service)
+    try:
+        payload = _cached_summary(user_key)
+
+        # Mailbox changed since the cached analysis ran — drop the stale memo
+        # and analyze fresh, rather than serving old numbers under a new tag
+        if live_history_id and payload.get("history_id") not in (None, live_history_id):
+            cache.delete_memoized(_cached_summary, user_key)
+            payload = _cached_summary(user_key)
+    except SummaryError as e:
+        return jsonify({"error": e.message}), e.status_code
+
+    # The ETag is the historyId observed when THIS payload was computed, so
+    # the tag always matches the body the client actually holds. A client
+    # revalidating with that tag gets a free 304.
+    etag = payload.get("history_id")
+    if etag and request.if_none_match.contains_weak(etag):
+        return "", 304
+
+    # Return everything as a clean JSON response, tagged so the browser can
+    # revalidate cheaply next time
+    response = jsonify(payload)
+    if etag:
+        response.set_etag(etag, weak=True)
+        response.cache_control.private = True   # per-user data — no shared caches
+        response.cache_control.max_age = 300
+    return response
+
+
+def _sse_frame(data, event=None):
+    """Formats one Server-Sent Events frame ("event: ...\\ndata: ...\\n\\n")."""
+    frame = f"event: {event}\n" if event else ""
+    return frame + "data: " + orjson.dumps(data).decode() + "\n\n"
+
+
+@email_bp.route("/emails/summary/stream")
+def email_summary_stream():
+    """
+    GET /emails/summary/stream
+
+    Same analysis as /emails/summary, but streamed as Server-Sent Events:
+    a progress frame after each completed batch, then a final "done" frame
+    with the full stats + carbon footprint. The frontend can listen with
+    an EventSource and update the dashboard as numbers arrive, instead of
+    showing a spinner until the whole scan finishes.
+    """
+    service, error = get_gmail_service()
     if error:
-        return jsonify({"error": error}), 500
+        return jsonify({
+            "error": error,
+            "hint": "Visit /auth first to connect your Gmail account"
+        }), 401
+
+    def generate():
+        try:
+            for update in analyze_emails_stream(service):
+                if update.get("done"):
+                    analysis = update["analysis"]
+                    yield _sse_frame({
+                        "status": "success",
+                        "email_stats": analysis,
+                        "carbon_footprint": calculate_carbon(
+                            analysis.get("estimated_total_size_mb", analysis["total_size_mb"])
+                        ),
+                        "message": "💚 GREENBYTE analysis complete"
+                    }, event="done")
+                else:
+                    yield _sse_frame(update)
+        except Exception as e:
+            yield _sse_frame({"error": f"Failed to analyze emails: {str(e)}"}, event="error")
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype="text/event-stream",
+        # Tell proxies not to buffer the stream — we want frames out immediately
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
-    # Calculate carbon footprint from the storage data
-    carbon_data = calculate_carbon(analysis["total_size_mb"])
 
-    # Return everything as a clean JSON response
+@email_bp.route("/emails/refresh")
+def email_refresh():
+    """
+    GET /emails/refresh
+
+    Throws away the cached analysis for the current user so the next
+    /emails/summary call re-fetches everything from Gmail.
+    """
+    service, error = get_gmail_service()
+    if error:
+        return jsonify({
+            "error": error,
+            "hint": "Visit /auth first to connect your Gmail account"
+        }), 401
+
+    cache.delete_memoized(_cached_summary, _user_cache_key(service))
     return jsonify({
         "status": "success",
-        "email_stats": analysis,
-        "carbon_footprint": carbon_data,
-        "message": "💚 GREENBYTE analysis complete"
+        "message": "Cache cleared — the next summary will be freshly analyzed."
     })
@@ -0,0 +1,10 @@
+# extensions.py — Shared Flask extensions live here
+# Keeping the cache object in its own module avoids circular imports:
+# app.py imports the blueprints, and the blueprints import the cache from here.
+
+from flask_caching import Cache
+
+# The cache is created "unbound" here and attached to the app in app.py
+# via cache.init_app(app). SimpleCache stores everything in process memory —
+# perfect for a single-worker demo. For multiple workers, switch to RedisCache.
+cache = Cache()
@@ -3,10 +3,14 @@
 
 import os
 import json
+from datetime import datetime
 from google_auth_oauthlib.flow import Flow         # Manages the OAuth login steps
 from google.oauth2.credentials import Credentials  # Represents a logged-in user's tokens
 from google.auth.transport.requests import Request # Used to refresh expired tokens
-from googleapiclient.discovery import build        # Builds the Gmail API client
+from google_auth_httplib2 import AuthorizedHttp    # Credentials + per-request HTTP transport
+from googleapiclient import discovery_cache        # Bundled API descriptions (no HTTP fetch)
+from googleapiclient.discovery import build_from_document  # Builds the Gmail API client
+import httplib2
 
 # --- Constants ---
 
@@ -26,20 +30,94 @@ SCOPES = ["https://www.googleapis.com/auth/gmail.readonly"]
 # When running locally, this is http://localhost:5001/callback
 REDIRECT_URI = os.getenv("REDIRECT_URI", "http://localhost:5001/callback")
 
+# oauthlib normally refuses plain-HTTP redirect URIs. Allow them ONCE at
+# import time when the configured redirect is http:// (i.e. local dev) —
+# doing it here keeps the env-var write out of every /auth request, and a
+# proper https:// production URI never triggers it.
+if REDIRECT_URI.startswith("http://"):
+    os.environ["OAUTHLIB_INSECURE_TRANSPORT"] = "1"
+
+# Parsed contents of credentials.json, loaded lazily on the first /auth hit
+# and reused for every one after — saves a file open + JSON parse per request.
+# (Lazy rather than at import so the app can still boot without the file.)
+_client_config = None
+
+# If the access token expires within this many seconds, refresh it up front.
+# The batch requests in email_analyzer don't auto-refresh mid-flight — if the
+# token dies while 5 batches are in the air, all 500 subrequests 401 and the
+# whole scan has to be redone. Refreshing a minutes-early token avoids that.
+TOKEN_REFRESH_MARGIN_SECONDS = 300  # 5 minutes
+
+# --- In-process token cache ---
+# Re-reading + re-parsing token.json on EVERY request costs a syscall and a
+# JSON parse each time. Instead we keep the parsed dict in memory and only
+# re-read the file when its modification time changes (e.g. another worker
+# refreshed the token). Think of st_mtime as the file's "version number".
+_token_cache = {
+    "mtime": None,   # st_mtime of token.json when we last read it
+    "data": None     # the parsed token dict
+}
+
+# --- Discovery document cache ---
+# The expensive part of building a Gmail client is parsing the discovery
+# document (a huge JSON description of the whole API). That document is
+# identical for every user and every request, so we parse it ONCE per process
+# and hand each request its own cheap service built from the parsed dict.
+# What we deliberately do NOT share is the HTTP transport: httplib2.Http is
+# not thread/greenlet-safe, and under the gevent workers two concurrent
+# requests sharing one transport would interleave on the same socket —
+# email_analyzer builds a transport per batch thread for exactly this reason.
+_discovery_doc = {"doc": None}   # parsed Gmail v1 discovery document
+
+
+def _get_discovery_doc():
+    """Returns the parsed Gmail v1 discovery document, loading it only once."""
+    if _discovery_doc["doc"] is None:
+        _discovery_doc["doc"] = json.loads(
+            discovery_cache.get_static_doc("gmail", "v1")
+        )
+    return _discovery_doc["doc"]
+
+
+def _load_token_data():
+    """
+    Returns the parsed token.json dict, using the in-process cache when the
+    file hasn't changed on disk. Returns None if no token file exists.
+    """
+    try:
+        mtime = os.stat(TOKEN_FILE).st_mtime
+    except OSError:
+        return None
+
+    # Cache hit: the file on disk is the same one we already parsed
+    if _token_cache["mtime"] == mtime and _token_cache["data"] is not None:
+        return _token_cache["data"]
+
+    with open(TOKEN_FILE, "r") as f:
+        token_data = json.load(f)
+
+    _token_cache["mtime"] = mtime
+    _token_cache["data"] = token_data
+    return token_data
+
 
 def get_auth_flow():
     """
     Creates a Google OAuth Flow object.
-    
+
     The Flow object manages the entire OAuth handshake process.
-    It reads your app's client ID and secret from credentials.json.
+    Your app's client ID and secret come from credentials.json, which is
+    read from disk only once and kept in memory after that.
     """
-    # os.environ is set to allow HTTP (not just HTTPS) for local development
-    # NEVER do this in production — remove this line when deploying
-    os.environ["OAUTHLIB_INSECURE_TRANSPORT"] = "1"
-
-    flow = Flow.from_client_secrets_file(
-        CREDENTIALS_FILE,       # Your downloaded credentials.json
+    global _client_config
+    if _client_config is None:
+        with open(CREDENTIALS_FILE) as f:
+            _client_config = json.load(f)
+
+    # from_client_config builds the flow from the already-parsed dict —
+    # no file I/O on this path once the config is cached
+    flow = Flow.from_client_config(
+        _client_config,
         scopes=SCOPES,
         redirect_uri=REDIRECT_URI
     )
@@ -60,11 +138,23 @@ def save_credentials(credentials):
         "token_uri": credentials.token_uri,
         "client_id": credentials.client_id,
         "client_secret": credentials.client_secret,
-        "scopes": list(credentials.scopes) if credentials.scopes else []
+        "scopes": list(credentials.scopes) if credentials.scopes else [],
+        # Persist WHEN the access token dies (naive UTC datetime) — without
+        # this, reloaded credentials report expiry=None and look "valid"
+        # forever, so the pre-refresh check below could never fire
+        "expiry": credentials.expiry.isoformat() if credentials.expiry else None
     }
-    # Write tokens to a JSON file
-    with open(TOKEN_FILE, "w") as f:
+    # Write to a temp file first, then atomically rename over the real one.
+    # This way a concurrent reader NEVER sees a half-written JSON file —
+    # os.replace is atomic on the same filesystem.
+    tmp_file = TOKEN_FILE + ".tmp"
+    with open(tmp_file, "w") as f:
         json.dump(token_data, f)
+    os.replace(tmp_file, TOKEN_FILE)
+
+    # Update the in-process cache so the next request doesn't re-read the file
+    _token_cache["mtime"] = os.stat(TOKEN_FILE).st_mtime
+    _token_cache["data"] = token_data
 
 
 def get_gmail_service():
@@ -76,13 +166,17 @@ def get_gmail_service():
     
     Returns: (service, error) — one of them will be None
     """
-    # Check if we have saved credentials
-    if not os.path.exists(TOKEN_FILE):
+    # Load the saved credentials (from the in-process cache when possible)
+    token_data = _load_token_data()
+    if token_data is None:
         return None, "Not authenticated. Please visit /auth to connect Gmail."
 
-    # Load the saved credentials from file
-    with open(TOKEN_FILE, "r") as f:
-        token_data = json.load(f)
+    # Restore the saved expiry (google-auth expects a naive UTC datetime).
+    # Tokens saved before expiry tracking was added simply have None here,
+    # which behaves like before: no pre-refresh, refresh on 401 instead.
+    expiry = None
+    if token_data.get("expiry"):
+        expiry = datetime.fromisoformat(token_data["expiry"])
 
     creds = Credentials(
         token=token_data["token"],
@@ -90,7 +184,8 @@ def get_gmail_service():
         token_uri=token_data["token_uri"],
         client_id=token_data["client_id"],
         client_secret=token_data["client_secret"],
-        scopes=token_data.get("scopes", SCOPES)
+        scopes=token_data.get("scopes", SCOPES),
+        expiry=expiry
     )
 
     # If the access token has expired, use the refresh token to get a new one
@@ -105,10 +200,30 @@ def get_gmail_service():
         else:
             return None, "Invalid credentials. Please re-authenticate at /auth."
 
+    # Pre-refresh tokens that are ABOUT to expire, not just already-expired ones.
+    # (creds.expiry is a naive UTC datetime, so compare against utcnow.)
+    elif (
+        creds.expiry
+        and creds.refresh_token
+        and (creds.expiry - datetime.utcnow()).total_seconds() < TOKEN_REFRESH_MARGIN_SECONDS
+    ):
+        try:
+            creds.refresh(Request())
+            save_credentials(creds)
+        except Exception as e:
+            return None, f"Token refresh failed: {str(e)}. Please re-authenticate at /auth."
+
     # Build the Gmail API service client
     # "gmail" = which API, "v1" = which version
+    # The shared (per-process) part is the parsed discovery document — the
+    # expensive bit. Each request gets its OWN AuthorizedHttp transport:
+    # httplib2.Http is not safe to share between threads or greenlets, so a
+    # cached transport would let two concurrent requests for the same user
+    # interleave on one socket. Within this one request the transport still
+    # reuses its keep-alive connection across the list/get/profile calls.
     try:
-        service = build("gmail", "v1", credentials=creds)
+        authed_http = AuthorizedHttp(creds, http=httplib2.Http(timeout=30))
+        service = build_from_document(_get_discovery_doc(), http=authed_http)
         return service, None
     except Exception as e:
         return None, f"Failed to build Gmail service: {str(e)}"
@@ -0,0 +1,19 @@
+# wsgi.py — Production entry point for gunicorn's gevent workers
+#
+# gevent swaps greenlets whenever one blocks on a socket, so a single worker
+# can keep hundreds of Gmail fetches in flight instead of handling one
+# request at a time like the Werkzeug dev server.
+#
+# The monkey-patch MUST run before anything that imports the socket/ssl
+# modules (Flask, the Google clients, ...) — that's the whole reason this
+# file exists separately from app.py.
+from gevent import monkey
+
+monkey.patch_all()
+
+# Only import the app AFTER patching, so every library picks up the
+# cooperative (non-blocking) socket implementation
+from app import app  # noqa: E402  (import placed after monkey.patch_all on purpose)
+
+if __name__ == "__main__":
+    app.run()